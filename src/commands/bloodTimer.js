@@ -1,6 +1,7 @@
 const { SlashCommandBuilder, EmbedBuilder } = require('discord.js');
 const logger = require('../lib/logger'); // Import the logger module
 const db = require('../lib/database');
+const { rescheduleTimerReminders } = require('../lib/timerReminder');
 
 module.exports = {
   data: new SlashCommandBuilder()
@@ -56,6 +57,8 @@ module.exports = {
               channel_id: channelId,
               castle_level: level
             });
+            // The new timer may need a reminder before the one currently scheduled
+            await rescheduleTimerReminders();
             // Reply to the user with a success message
             await interaction.editReply({
               content: `✅ Started blood timer for level ${level} castle (${hours} hours)`
@@ -79,13 +79,4 @@ module.exports = {
             await interaction.editReply({ content: 'Failed to create private persona thread.', ephemeral: true });
         }
     },
-};
-            });
-
-            await interaction.editReply({ content: `Private persona thread created: ${thread}`, ephemeral: true });
-        } catch (error) {
-            console.error('Error creating private thread:', error);
-            await interaction.editReply({ content: 'Failed to create private persona thread.', ephemeral: true });
-        }
-    },
 };
\ No newline at end of file
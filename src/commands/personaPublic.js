@@ -3,6 +3,74 @@ const { SlashCommandBuilder, ChannelType, EmbedBuilder } = require('discord.js')
 const logger = require('../lib/logger');
 const db = require('../lib/database');
 
+// Minimum time between two personas created by the same user
+const CREATION_COOLDOWN_MS = 5 * 60 * 1000; // 5 minutes
+// User ID -> monotonic time of their last creation, oldest first
+const lastCreations = new Map();
+
+// Leading bytes of the image formats accepted as avatars (PNG, JPEG, GIF)
+const IMAGE_SIGNATURES = [
+  Buffer.from([0x89, 0x50, 0x4E, 0x47]),
+  Buffer.from([0xFF, 0xD8, 0xFF]),
+  Buffer.from('GIF8', 'ascii')
+];
+// Give up on reading the avatar header after this long
+const SNIFF_TIMEOUT_MS = 5000;
+
+/**
+ * @async
+ * @function sniffImage
+ * @description Checks that a file really is a PNG, JPEG or GIF by fetching only its first bytes, since the attachment's content type is whatever the uploader claimed.
+ * @param {string} url - The URL of the file.
+ * @returns {Promise<boolean>} True if the file starts with a known image signature, false otherwise.
+ * @throws {Error} If the file could not be fetched, so callers can tell a download failure from a non-image.
+ */
+async function sniffImage(url) {
+  const response = await fetch(url, {
+    headers: { Range: 'bytes=0-11' },
+    signal: AbortSignal.timeout(SNIFF_TIMEOUT_MS)
+  });
+  if (!response.ok) {
+    await response.body?.cancel();
+    throw new Error(`Avatar download failed with status ${response.status}`);
+  }
+  if (!response.body) return false;
+  // Read only the first chunk, in case the server ignores the range and sends the whole file
+  const reader = response.body.getReader();
+  const { value } = await reader.read();
+  reader.cancel().catch(() => {});
+  if (!value) return false;
+  const header = Buffer.from(value.buffer, value.byteOffset, value.byteLength);
+  return IMAGE_SIGNATURES.some(signature => header.subarray(0, signature.length).equals(signature));
+}
+
+/**
+ * @function getCooldownRemaining
+ * @description Returns how long a user still has to wait before creating another persona.
+ * @param {string} userId - The ID of the user.
+ * @param {number} now - The current monotonic time in milliseconds.
+ * @returns {number} The remaining cooldown in milliseconds, 0 if none.
+ */
+const getCooldownRemaining = (userId, now) => {
+  const lastCreated = lastCreations.get(userId);
+  return lastCreated === undefined ? 0 : Math.max(0, CREATION_COOLDOWN_MS - (now - lastCreated));
+};
+
+/**
+ * @function recordCreation
+ * @description Starts a user's cooldown and drops cooldowns that have already expired.
+ * @param {string} userId - The ID of the user.
+ * @param {number} now - The current monotonic time in milliseconds.
+ */
+const recordCreation = (userId, now) => {
+  for (const [id, createdAt] of lastCreations) {
+    if (now - createdAt < CREATION_COOLDOWN_MS) break;
+    lastCreations.delete(id);
+  }
+  lastCreations.delete(userId);
+  lastCreations.set(userId, now);
+};
+
 // Export the command module
 module.exports = {
   // Define the command data using SlashCommandBuilder
@@ -66,8 +134,18 @@ module.exports = {
         return interaction.editReply('❌ Avatar must be an image (JPG/PNG/GIF)'); // Reply with an error if the avatar is not an image
       }
 
+      // Enforce the cooldown between creations, measured on the monotonic clock
+      const userId = interaction.user.id;
+      const cooldownRemaining = getCooldownRemaining(userId, performance.now());
+      if (cooldownRemaining > 0) {
+        const minutesLeft = Math.ceil(cooldownRemaining / 60000);
+        return interaction.editReply(
+          `❌ Please wait ${minutesLeft} more minute${minutesLeft === 1 ? '' : 's'} before creating another persona.`
+        ); // Reply with an error if the user created a persona too recently
+      }
+
       // Check rate limits to ensure the user hasn't exceeded the maximum number of active personas
-      const threadCount = await db.getUserThreadCount(interaction.user.id);
+      const threadCount = await db.getUserThreadCount(userId);
       if (threadCount >= 3) { // Assuming the limit is still 3
         return interaction.editReply(
           `❌ You've reached the maximum of 3 active personas. ` +
@@ -75,6 +153,18 @@ module.exports = {
         ); // Reply with an error if the user has reached the maximum number of active personas
       }
 
+      // Verify the avatar's actual bytes before creating anything
+      let isImage;
+      try {
+        isImage = await sniffImage(avatar.url);
+      } catch (sniffError) {
+        logger.warn(`Could not read avatar header from ${avatar.url}:`, sniffError);
+        return interaction.editReply("❌ Couldn't download your avatar right now. Please try again in a moment."); // Reply with a retry message if Discord's CDN failed or timed out
+      }
+      if (!isImage) {
+        return interaction.editReply('❌ Avatar must be an image (JPG/PNG/GIF)'); // Reply with an error if the file is not a supported image
+      }
+
       // Create a new public thread in the channel
       const thread = await interaction.channel.threads.create({
         name: `${name} RP`,
@@ -126,17 +216,15 @@ module.exports = {
         system_context: systemContext, // Use the detailed context
         channel_id: interaction.channel.id,
         guild_id: interaction.guild?.id,
-        created_by: interaction.user.id,
+        created_by: userId,
         created_at: new Date().toISOString(),
         avatar_url: avatar.url
       };
 
       // Store in database (assuming db function can handle the new fields)
-      // Try to create the thread document in the database
-      try {
-          await db.createThreadDocument(thread.id, threadData); // Attempt to save the thread data to the database
-      } catch (dbError) {
-          logger.error(`Database error saving thread ${thread.id}:`, dbError); // Log the error if the database save fails
+      // createThreadDocument logs its own errors and reports a failed save by returning false
+      const saved = await db.createThreadDocument(thread.id, threadData); // Attempt to save the thread data to the database
+      if (!saved) {
           // Attempt to delete the created thread if database save fails
           try {
               await thread.delete('Database save failed'); // Attempt to delete the thread
@@ -145,24 +233,28 @@ module.exports = {
           }
           return interaction.editReply('❌ Failed to save persona data. Thread creation cancelled.'); // Reply with an error if the database save fails
       }
+      // Only a persona that was actually saved starts the cooldown
+      recordCreation(userId, performance.now());
 
 
       // Send welcome message embed to the thread
       // Construct an embed to welcome users to the new thread
+      // Collect every field first so the embed is built with a single addFields call
+      const fields = [ // Fields for the persona's description and personality
+        { name: '👤 Description', value: description },
+        { name: '✨ Personality', value: personality }
+      ];
+      if (scenario) {
+        fields.push({ name: '🗺️ Scenario', value: scenario }); // Add a field for the scenario if it exists
+      }
+
       const embed = new EmbedBuilder()
         .setTitle(`${name} is ready for RP!`)
         .setDescription(`Start chatting in this thread to interact with ${name}.`)
-        .setThumbnail(avatar.url)
-        .addFields( // Add fields for the persona's description and personality
-          { name: '👤 Description', value: description },
-          { name: '✨ Personality', value: personality }
-        )
+        .setThumbnail(avatar.proxyURL) // Discord's media proxy caches the image for every viewer
+        .addFields(fields)
         .setFooter({ text: `Created by ${interaction.user.displayName}` }); // Add a footer with the creator's name
 
-      if (scenario) {
-        embed.addFields({ name: '🗺️ Scenario', value: scenario }); // Add a field for the scenario if it exists
-      }
-
       await thread.send({ embeds: [embed] }); // Send the embed to the thread
 
       // Send the character's first message to start the roleplay
@@ -3,6 +3,13 @@ const logger = require('../lib/logger'); // Import the logger module
 const db = require('../lib/database'); // Import the database module
 const aiService = require('../lib/aiService'); // Import the AI service module
 
+// Thread ID -> promise of the last queued message, so each thread is answered in order while threads run in parallel
+const threadQueues = new Map();
+// Columns needed to reply, shared by every lookup
+const THREAD_COLUMNS = Object.freeze(['id', 'system_context', 'history']);
+// Replies generated faster than this are sent without a typing indicator
+const TYPING_DELAY_MS = 700;
+
 // Export the messageCreate event module
 module.exports = {
   // Set the name of the event
@@ -10,17 +17,43 @@ module.exports = {
   /**
    * @async
    * @function execute
-   * @description Executes when a message is created in a channel. This function handles messages in threads, interacts with the AI, and updates the conversation history.
+   * @description Executes when a message is created in a channel. Thread messages are queued per thread so replies and history stay in order.
    * @param {object} message - The message object provided by Discord.js.
    */
   async execute(message) {
     // Ignore messages from bots or messages that are not in threads
     if (message.author.bot || !message.channel.isThread()) return;
 
+    const threadId = message.channel.id;
+    const previous = threadQueues.get(threadId) || Promise.resolve();
+    const handle = () => this.handleMessage(message);
+    const current = previous.then(handle, handle);
+    threadQueues.set(threadId, current);
+    try {
+      await current;
+    } finally {
+      // Drop the queue once it has drained so idle threads don't accumulate
+      if (threadQueues.get(threadId) === current) {
+        threadQueues.delete(threadId);
+      }
+    }
+  },
+
+  /**
+   * @async
+   * @function handleMessage
+   * @description Handles a message in a thread: interacts with the AI and updates the conversation history.
+   * @param {object} message - The message object provided by Discord.js.
+   */
+  async handleMessage(message) {
+    // Bind the channel and its ID once, they are used throughout the handler
+    const channel = message.channel;
+    const threadId = channel.id;
+
     // Use a try-catch block to handle any errors during the message processing
     try {
-      // Try to get the thread data from the database
-      const threadData = await db.getThreadData(message.channel.id);
+      // Try to get the thread data from the database, loading only the columns needed to reply
+      const threadData = await db.getThreadData(threadId, THREAD_COLUMNS);
       // If no thread data is found, return
       if (!threadData) return;
 
@@ -29,9 +62,6 @@ module.exports = {
       // If the message is empty, return
       if (!userMessage.trim()) return;
 
-      // Send a typing indicator to the channel
-      await message.channel.sendTyping();
-
       // AI Integration
       // Get the system context and history from the thread data
       const systemContext = threadData.system_context;
@@ -40,60 +70,63 @@ module.exports = {
 
       // Use a try-catch block to handle any errors during the AI integration
       try {
+        // Show a typing indicator only once generation takes long enough to notice, saving the request for fast replies
+        const typingTimer = setTimeout(() => {
+          channel.sendTyping().catch(e => logger.warn(`Failed to send typing indicator for thread ${threadId}:`, e));
+        }, TYPING_DELAY_MS);
         // Call the AI service to generate a response
-        aiResponse = await aiService.generateResponse(systemContext, history, userMessage);
+        try {
+          aiResponse = await aiService.generateResponse(systemContext, history, userMessage, { threadId });
+        } finally {
+          clearTimeout(typingTimer);
+        }
 
         // Check if the response is meaningful
         if (!aiResponse || typeof aiResponse !== 'string' || !aiResponse.trim()) {
           // Log a warning if the response is empty or invalid
-          logger.warn(`AI service returned an empty or invalid response for thread ${message.channel.id}`);
+          logger.warn(`AI service returned an empty or invalid response for thread ${threadId}`);
           // Use a generic fallback message
           aiResponse = "(I'm having trouble forming a response right now.)";
           // Send the fallback message to the channel
-          await message.channel.send(aiResponse);
+          await channel.send(aiResponse);
           return; // Stop processing this message
         }
 
       } catch (aiError) {
         // Log an error if the AI generation fails
-        logger.error(`AI generation failed for thread ${message.channel.id}:`, aiError);
+        logger.error(`AI generation failed for thread ${threadId}:`, aiError);
         // Notify the user that the AI call failed
         await message.reply("😵‍💫 My circuits are a bit scrambled. I couldn't come up with a response right now. Please try again later.").catch(e => logger.error("Failed to send AI error reply:", e));
         return; // Stop processing if the AI fails
       }
       // End AI Integration
       
-      // Update History
-      // Use a try-catch block to handle any errors during the history update
-      try {
-        // Try to update the thread history in the database
-        await db.updateThreadHistory(
-          message.channel.id,
-          userMessage,
-          aiResponse
-        );
-      } catch (dbError) {
-        // Log an error if the history update fails
-        logger.error(`Failed to update history for thread ${message.channel.id}:`, dbError);
-        // Notify the user that the history update failed, but still send the response
-        await message.reply("⚠️ I got your message and generated a response, but had trouble remembering our conversation for next time.").catch(e => logger.error("Failed to send DB error reply:", e));
-      }
-      // End Update History
-
       // Send the AI's response to the channel
       // Check if the response exceeds Discord's character limit (2000 characters)
       if (aiResponse.length > 2000) {
         // Log a warning if the response exceeds the limit
-         logger.warn(`AI response exceeded 2000 characters for thread ${message.channel.id}. Truncating.`);
+         logger.warn(`AI response exceeded 2000 characters for thread ${threadId}. Truncating.`);
          // Truncate the response to fit within the limit
          aiResponse = aiResponse.substring(0, 1997) + "...";
       }
       // Send the response to the channel
-      await message.channel.send(aiResponse);
+      await channel.send(aiResponse);
+
+      // Update History
+      // Build the exchange once and share it between the AI session and the database
+      const exchange = [
+        { role: 'user', parts: [{ text: userMessage }] },
+        { role: 'model', parts: [{ text: aiResponse }] }
+      ];
+      aiService.recordExchange(threadId, exchange);
+      // The user already has their reply, so the history write is not awaited; it is queued before this returns,
+      // so the next message in the thread still sees it. Failed flushes are retried by the database service.
+      db.appendHistory(threadId, exchange).catch(dbError => logger.error(`Failed to queue history for thread ${threadId}:`, dbError));
+      // End Update History
 
     } catch (error) {
       // Log any unhandled errors that occur during the message processing
-      logger.error(`Unhandled error processing message in thread ${message.channel.id}:`, error);
+      logger.error(`Unhandled error processing message in thread ${threadId}:`, error);
       // Check if the message channel context is lost
       if (!message.channel) {
         // Log an error if the message channel context is lost
@@ -109,7 +142,7 @@ module.exports = {
         }
       } catch (replyError) {
         // Log an error if the error reply fails
-        logger.error(`Failed to send final error reply to channel ${message.channel.id}:`, replyError);
+        logger.error(`Failed to send final error reply to channel ${threadId}:`, replyError);
       }
     }
   }
@@ -2,6 +2,9 @@
 const logger = require('../lib/logger');
 const db = require('../lib/database');
 
+// Only the thread's existence matters when cleaning up
+const THREAD_COLUMNS = Object.freeze(['id']);
+
 // Export the threadDelete event module
 module.exports = {
   // Set the name of the event
@@ -16,7 +19,7 @@ module.exports = {
     // Use a try-catch block to handle any errors during the thread deletion process
     try {
       // Try to get the thread data from the database
-      const threadData = await db.getThreadData(thread.id);
+      const threadData = await db.getThreadData(thread.id, THREAD_COLUMNS);
       // If no thread data is found, return (not a persona thread)
       if (!threadData) return;
 
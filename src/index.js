@@ -1,12 +1,20 @@
 // Load environment variables from .env file
 require('dotenv').config();
+// Size libuv's threadpool before anything uses it; it serves the DNS lookups behind every Discord/Gemini
+// request and file I/O, and the default of 4 is easily saturated by concurrent replies (no effect on Windows)
+process.env.UV_THREADPOOL_SIZE = process.env.UV_THREADPOOL_SIZE || '8';
 // Import necessary modules from discord.js, express, fs, path, and custom modules (logger and db)
 const { Client, GatewayIntentBits, Collection } = require('discord.js');
 const express = require('express');
 const logger = require('./lib/logger');
 const db = require('./lib/database');
+const { startTimerReminders } = require('./lib/timerReminder');
 const fs = require('fs');
 const path = require('path');
+const crypto = require('crypto');
+
+// Hash of the last slash command set registered with Discord
+const COMMAND_HASH_FILE = path.join(__dirname, '..', '.command_tree.hash');
 
 // Create an instance of express
 const app = express();
@@ -34,6 +42,10 @@ client.commands = new Collection();
 client.on('ready', () => {
   // Log a message indicating the bot is logged in
   logger.info(`Logged in as ${client.user.tag}`);
+  // Register slash commands with Discord if they changed
+  syncCommands().catch(error => logger.error('Failed to sync slash commands:', error));
+  // Post blood essence reminders as timers run low
+  startTimerReminders(client);
 });
 
 // Event handler for client errors
@@ -62,6 +74,11 @@ async function loadCommands() {
       try {
         // Import the command
         const command = require(filePath);
+        // Register each command name exactly once, a later duplicate would silently replace the first
+        if (client.commands.has(command.data.name)) {
+          logger.warn(`Skipping duplicate command ${command.data.name} from ${file}`);
+          continue;
+        }
         // Set the command in the client's command collection
         client.commands.set(command.data.name, command);
       } catch (error) {
@@ -77,6 +94,32 @@ async function loadCommands() {
   }
 }
 
+/**
+ * @async
+ * @function syncCommands
+ * @description Registers the loaded slash commands with Discord, skipping the API call when they are unchanged since the last sync. Set SYNC_COMMANDS=1 to force it.
+ */
+async function syncCommands() {
+  const body = client.commands.map(command => command.data.toJSON());
+  const hash = crypto.createHash('sha256')
+    .update(JSON.stringify([client.application.id, body]))
+    .digest('hex');
+
+  if (process.env.SYNC_COMMANDS !== '1') {
+    const previousHash = await fs.promises.readFile(COMMAND_HASH_FILE, 'utf8').catch(() => null);
+    if (previousHash?.trim() === hash) {
+      logger.info('Slash commands unchanged, skipping sync');
+      return;
+    }
+  }
+
+  await client.application.commands.set(body);
+  logger.info(`Synced ${body.length} slash commands`);
+  // Read-only filesystems (e.g. Vercel) just sync again on the next start
+  await fs.promises.writeFile(COMMAND_HASH_FILE, hash)
+    .catch(error => logger.warn('Could not store slash command hash:', error));
+}
+
 async function loadEvents() {
   const eventsPath = path.join(__dirname, 'events');
   const eventFiles = fs.readdirSync(eventsPath)
@@ -118,15 +161,17 @@ let server;
  */
 async function startBot() {
   try {
-    // Connect to the database
-    if (!await db.connect()) {
+    // Connect to the database while commands and events are loaded
+    const [dbConnected] = await Promise.all([
+      db.connect(),
+      loadCommands(),
+      loadEvents()
+    ]);
+    if (!dbConnected) {
       throw new Error('Failed to connect to database');
     }
-
-    // Load commands
-    await loadCommands();
-    // Load events
-    await loadEvents();
+    // Load active threads in one query instead of one lookup per thread on its first message
+    await db.preloadThreadCache();
 
     // Log in to Discord
     await client.login(process.env.DISCORD_TOKEN);
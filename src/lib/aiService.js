@@ -1,5 +1,8 @@
 // src/lib/aiService.js
+const crypto = require('crypto');
+const { setTimeout: sleep } = require('timers/promises');
 const logger = require('./logger');
+const { trimHistory, trimHistoryInPlace } = require('./history');
 // Ensure you have node-fetch or a compatible fetch implementation
 // You might need to install it: npm install node-fetch
 // If using Node 18+, fetch is available globally. For earlier versions:
@@ -7,7 +10,117 @@ const logger = require('./logger');
 
 const API_KEY = process.env.GEMINI_API_KEY;
 const MODEL_NAME = 'gemini-1.5-flash-001'; // Using the specified model
-const BASE_URL = `https://generativelanguage.googleapis.com/v1beta/models/${MODEL_NAME}:generateContent`;
+// Responses are streamed as server-sent events so oversized generations can be cut off early
+const BASE_URL = `https://generativelanguage.googleapis.com/v1beta/models/${MODEL_NAME}:streamGenerateContent`;
+// Rate-limited (429) requests are retried with exponential backoff: 1s, 2s, 4s
+const MAX_RETRIES = 3;
+// Discord's message limit; reading stops once a streamed response grows past it
+const MAX_RESPONSE_LENGTH = 2000;
+// Optional cap on Gemini requests in flight at once (unset means no cap)
+const MAX_CONCURRENT_REQUESTS = Number(process.env.AI_MAX_CONCURRENCY) || Infinity;
+// Optional rolling per-minute request cap matching the API key's quota (0 disables it)
+const REQUESTS_PER_MINUTE = Number(process.env.AI_REQUESTS_PER_MINUTE) || 0;
+const RATE_WINDOW_MS = 60 * 1000;
+
+let activeRequests = 0;
+const waitingForSlot = [];
+// Start times of requests within the current rate window, oldest first
+const recentRequestTimes = [];
+
+/**
+ * @async
+ * @function acquireRequestSlot
+ * @description Waits until fewer than MAX_CONCURRENT_REQUESTS Gemini requests are in flight.
+ */
+async function acquireRequestSlot() {
+  if (activeRequests < MAX_CONCURRENT_REQUESTS) {
+    activeRequests++;
+    return;
+  }
+  // The releasing request hands its slot over directly
+  await new Promise(resolve => waitingForSlot.push(resolve));
+}
+
+/**
+ * @function releaseRequestSlot
+ * @description Frees a request slot, passing it to the next waiting request if there is one.
+ */
+const releaseRequestSlot = () => {
+  const next = waitingForSlot.shift();
+  if (next) {
+    next();
+  } else {
+    activeRequests--;
+  }
+};
+
+/**
+ * @async
+ * @function waitForRateWindow
+ * @description Delays a request until it fits within the per-minute request cap, then records it.
+ */
+async function waitForRateWindow() {
+  if (!REQUESTS_PER_MINUTE) return;
+  for (;;) {
+    const now = performance.now();
+    while (recentRequestTimes.length && now - recentRequestTimes[0] >= RATE_WINDOW_MS) {
+      recentRequestTimes.shift();
+    }
+    if (recentRequestTimes.length < REQUESTS_PER_MINUTE) {
+      recentRequestTimes.push(now);
+      return;
+    }
+    await sleep(RATE_WINDOW_MS - (now - recentRequestTimes[0]));
+  }
+}
+
+// Exact-match response cache: identical persona + history + message skips the API call entirely
+const RESPONSE_CACHE_MAX_ENTRIES = 1024;
+const RESPONSE_CACHE_TTL_MS = Number(process.env.AI_CACHE_TTL_MS) || 5 * 60 * 1000; // 5 minutes
+// A Map keeps insertion order, so the first key is always the least recently used entry
+const responseCache = new Map();
+
+/**
+ * @function getCacheKey
+ * @description Builds a compact cache key from everything that influences the generated response.
+ * @param {string} systemContext - The system context or persona.
+ * @param {Array} history - The array of conversation history objects.
+ * @param {string} userMessage - The latest message from the user.
+ * @returns {string} A base64 digest identifying the request.
+ */
+const getCacheKey = (systemContext, history, userMessage) =>
+  crypto.createHash('sha256')
+    .update(JSON.stringify([systemContext, history, userMessage]))
+    .digest('base64');
+
+/**
+ * @function getCachedResponse
+ * @description Looks up a cached response, dropping it if it has expired and refreshing its LRU position otherwise.
+ * @param {string} key - The cache key.
+ * @returns {string|undefined} The cached response text, if any.
+ */
+const getCachedResponse = (key) => {
+  const entry = responseCache.get(key);
+  if (!entry) return undefined;
+  responseCache.delete(key);
+  if (performance.now() - entry.createdAt > RESPONSE_CACHE_TTL_MS) return undefined;
+  // Re-insert to mark the entry as most recently used
+  responseCache.set(key, entry);
+  return entry.text;
+};
+
+/**
+ * @function setCachedResponse
+ * @description Stores a response in the cache, evicting the least recently used entries when over capacity.
+ * @param {string} key - The cache key.
+ * @param {string} text - The generated response text.
+ */
+const setCachedResponse = (key, text) => {
+  responseCache.set(key, { text, createdAt: performance.now() });
+  while (responseCache.size > RESPONSE_CACHE_MAX_ENTRIES) {
+    responseCache.delete(responseCache.keys().next().value);
+  }
+};
 
 /**
  * @function formatHistoryForGemini
@@ -31,6 +144,141 @@ const formatHistoryForGemini = (history) => {
   }));
 };
 
+// Serialized systemInstruction fields, so a multi-KB persona is JSON-encoded once rather than on every turn
+const SERIALIZED_PERSONA_MAX_ENTRIES = 64;
+const serializedPersonas = new Map();
+
+/**
+ * @function getSerializedPersona
+ * @description Returns the JSON-encoded systemInstruction field for a persona, ready to splice into a request body.
+ * @param {string} systemContext - The system context or persona.
+ * @returns {string} The serialized `"systemInstruction":{...}` field.
+ */
+const getSerializedPersona = (systemContext) => {
+  let serialized = serializedPersonas.get(systemContext);
+  if (serialized === undefined) {
+    serialized = `"systemInstruction":${JSON.stringify({ parts: [{ text: systemContext }] })}`;
+  } else {
+    serializedPersonas.delete(systemContext);
+  }
+  serializedPersonas.set(systemContext, serialized);
+  while (serializedPersonas.size > SERIALIZED_PERSONA_MAX_ENTRIES) {
+    serializedPersonas.delete(serializedPersonas.keys().next().value);
+  }
+  return serialized;
+};
+
+// Per-thread sessions: formatted contents are kept between turns instead of being rebuilt from history
+const SESSION_MAX_ENTRIES = 512;
+const sessions = new Map();
+
+/**
+ * @function getLastText
+ * @description Returns the text of the last entry in a history or contents array.
+ * @param {Array} entries - The history or contents array.
+ * @returns {string|undefined} The text of the last entry, if any.
+ */
+const getLastText = (entries) => entries[entries.length - 1]?.parts?.[0]?.text;
+
+/**
+ * @function getSessionContents
+ * @description Returns the formatted contents for a thread, reusing the live session when it matches the stored history.
+ * @param {string} [threadId] - The ID of the thread, sessions are only kept when provided.
+ * @param {Array} history - The array of conversation history objects.
+ * @returns {Array} The formatted conversation contents.
+ */
+const getSessionContents = (threadId, history) => {
+  // Older rows may hold more than the window, only the anchor and recent turns are sent
+  if (Array.isArray(history)) history = trimHistory(history);
+  if (threadId === undefined) return formatHistoryForGemini(history);
+
+  let contents = sessions.get(threadId);
+  sessions.delete(threadId);
+  // Rebuild when the stored history moved on without us (e.g. another instance or a failed write)
+  if (!contents || !Array.isArray(history) || contents.length !== history.length || getLastText(contents) !== getLastText(history)) {
+    contents = formatHistoryForGemini(history);
+  }
+  sessions.set(threadId, contents);
+  while (sessions.size > SESSION_MAX_ENTRIES) {
+    sessions.delete(sessions.keys().next().value);
+  }
+  return contents;
+};
+
+/**
+ * @function recordExchange
+ * @description Appends a completed exchange to a thread's session, keeping the same anchored window as the database.
+ * @param {string} threadId - The ID of the thread.
+ * @param {Array} entries - The user and model history entries, shared with the database write.
+ */
+const recordExchange = (threadId, entries) => {
+  const contents = sessions.get(threadId);
+  if (!contents) return;
+  contents.push(...entries);
+  trimHistoryInPlace(contents);
+};
+
+/**
+ * @async
+ * @function readStreamedResponse
+ * @description Collects a streamed Gemini response into a single response object, stopping early once the text outgrows a Discord message.
+ * @param {Response} response - The fetch response of a streamGenerateContent request.
+ * @returns {Promise<object>} A response object shaped like a generateContent result.
+ */
+async function readStreamedResponse(response) {
+  const decoder = new TextDecoder();
+  const reader = response.body.getReader();
+  const result = { candidates: [{}] };
+  let text = '';
+  let buffer = '';
+
+  // Each event carries a partial response; text is appended and the latest metadata kept
+  const handleEvent = (event) => {
+    const json = event.split(/\r?\n/)
+      .filter(line => line.startsWith('data:'))
+      .map(line => line.slice(5))
+      .join('');
+    if (!json.trim()) return;
+    const chunk = JSON.parse(json);
+    const candidate = chunk.candidates?.[0];
+    if (candidate?.content?.parts) {
+      text += candidate.content.parts.map(part => part.text || '').join('');
+    }
+    if (candidate?.finishReason) result.candidates[0].finishReason = candidate.finishReason;
+    if (chunk.promptFeedback) result.promptFeedback = chunk.promptFeedback;
+  };
+
+  try {
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) {
+        handleEvent(buffer);
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split(/\r?\n\r?\n/);
+      buffer = events.pop();
+      events.forEach(handleEvent);
+
+      if (text.length > MAX_RESPONSE_LENGTH) {
+        logger.warn(`Gemini response exceeded ${MAX_RESPONSE_LENGTH} characters, stopping the stream early`);
+        break;
+      }
+    }
+  } finally {
+    // Closes the connection if we stopped before the end of the stream
+    reader.cancel().catch(() => {});
+  }
+
+  if (text) {
+    result.candidates[0].content = { parts: [{ text }] };
+  }
+  if (!text && !result.candidates[0].finishReason) {
+    result.candidates = [];
+  }
+  return result;
+}
+
 /**
  * @async
  * @function generateResponse
@@ -38,30 +286,38 @@ const formatHistoryForGemini = (history) => {
  * @param {string} systemContext - The system context or persona to guide the AI's responses.
  * @param {Array} history - The array of conversation history objects.
  * @param {string} userMessage - The latest message from the user.
+ * @param {object} [options] - Optional settings.
+ * @param {boolean} [options.noCache=false] - Bypass the response cache for this call.
+ * @param {string} [options.threadId] - The thread the message belongs to, used to keep its session.
  * @returns {Promise<string|null>} The generated response text or null if an error occurs.
  */
-async function generateResponse(systemContext, history, userMessage) {
+async function generateResponse(systemContext, history, userMessage, { noCache = false, threadId } = {}) {
   // Check if the API key is set
   if (!API_KEY) {
     logger.error('GEMINI_API_KEY environment variable not set.');
     throw new Error('AI Service is not configured.');
   }
 
-  const url = `${BASE_URL}?key=${API_KEY}`;
+  // Reuse the thread's live session rather than reformatting the stored history
+  const sessionContents = getSessionContents(threadId, history);
+
+  // Serve repeated prompts straight from the cache
+  const cacheKey = noCache ? null : getCacheKey(systemContext, history, userMessage);
+  if (cacheKey) {
+    const cached = getCachedResponse(cacheKey);
+    if (cached !== undefined) {
+      logger.debug('Serving Gemini response from cache');
+      return cached;
+    }
+  }
+
+  const url = `${BASE_URL}?alt=sse&key=${API_KEY}`;
 
-  // Format the conversation history and add the new user message
-  const formattedHistory = formatHistoryForGemini(history);
-  const contents = [
-    ...formattedHistory,
-    { role: 'user', parts: [{ text: userMessage }] }
-  ];
+  // Add the new user message to the conversation so far
+  const contents = sessionContents.concat({ role: 'user', parts: [{ text: userMessage }] });
 
-  // Construct the request payload
+  // Construct the request payload, the persona is spliced in below from its pre-serialized form
   const payload = {
-    // System instruction provides context for the persona
-    systemInstruction: {
-        parts: [{ text: systemContext }]
-    },
     contents: contents,
     // Optional: Configure generation parameters (temperature, safety settings, etc.)
     // generationConfig: {
@@ -78,28 +334,54 @@ async function generateResponse(systemContext, history, userMessage) {
     // ],
   };
 
-  logger.debug(`Sending request to Gemini: ${JSON.stringify(payload)}`);
+  // System instruction provides context for the persona
+  const body = `{${getSerializedPersona(systemContext)},${JSON.stringify(payload).slice(1)}`;
+  // Debug output is filtered out in production, skip building it there
+  if (logger.isDebugEnabled()) {
+    logger.debug(`Sending request to Gemini: ${body}`);
+  }
 
   // Try catch block for handling the fetch call
   try {
-    // Fetch call to the Gemini API
-    const response = await fetch(url, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(payload),
-    });    
-    // Check if the response is ok
-    if (!response.ok) {
+    let data;
+    // The slot is held until the stream has been read or cancelled
+    await acquireRequestSlot();
+    try {
+      let response;
+      for (let attempt = 0; ; attempt++) {
+        await waitForRateWindow();
+        // Fetch call to the Gemini API
+        response = await fetch(url, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body,
+        });
+        if (response.status !== 429 || attempt === MAX_RETRIES) break;
+
+        // Discard the error body and give up the slot while backing off
+        await response.body?.cancel();
+        releaseRequestSlot();
+        logger.warn(`Gemini rate limit hit, retrying in ${2 ** attempt}s (attempt ${attempt + 1}/${MAX_RETRIES})`);
+        await sleep(2 ** attempt * 1000);
+        await acquireRequestSlot();
+      }
+      // Check if the response is ok
+      if (!response.ok) {
         const errorBody = await response.text();
         logger.error(`Gemini API request failed with status ${response.status}: ${errorBody}`);
         // return null if the response is not ok
         return null;
       }
-      // Parse the response to json
-      const data = await response.json();
-      logger.debug(`Received response from Gemini: ${JSON.stringify(data)}`);
+      // Collect the streamed chunks into a single response
+      data = await readStreamedResponse(response);
+    } finally {
+      releaseRequestSlot();
+    }
+      if (logger.isDebugEnabled()) {
+        logger.debug(`Received response from Gemini: ${JSON.stringify(data)}`);
+      }
 
       // Try catch block to handle any error that may occur during the response
       try {
@@ -107,6 +389,10 @@ async function generateResponse(systemContext, history, userMessage) {
         // Handle potential blocks or empty responses
         if (data.candidates && data.candidates.length > 0 && data.candidates[0].content && data.candidates[0].content.parts && data.candidates[0].content.parts.length > 0) {
            const generatedText = data.candidates[0].content.parts[0].text;
+           // Only cache real generations, never block or error notices
+           if (cacheKey && generatedText) {
+             setCachedResponse(cacheKey, generatedText);
+           }
            return generatedText;
         } else if (data.candidates && data.candidates.length > 0 && data.candidates[0].finishReason) {
             // Handle cases where generation stopped due to safety or other reasons
@@ -140,4 +426,5 @@ async function generateResponse(systemContext, history, userMessage) {
 
 module.exports = {
   generateResponse,
+  recordExchange,
 };
\ No newline at end of file
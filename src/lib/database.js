@@ -1,8 +1,85 @@
+const path = require('path');
 const { createConnection } = require('typeorm');
 const logger = require('./logger');
+const { HISTORY_LIMIT, trimHistory, trimHistoryInPlace } = require('./history');
 const PersonaThread = require('../models/PersonaThread');
 const VRisingTimer = require('../models/VRisingTimer');
 
+// Buffered history writes are flushed once this many pairs are pending, or after the interval
+const HISTORY_FLUSH_BATCH_SIZE = 16;
+const HISTORY_FLUSH_INTERVAL_MS = 2000;
+// The active thread count is re-read from the database at most this often
+const THREAD_COUNT_TTL_MS = 60 * 1000;
+// Per-user thread counts are cached for the same period, bounded to this many users
+const USER_THREAD_COUNT_MAX_ENTRIES = 4096;
+// Thread ID criteria objects are reused across queries instead of being allocated per call
+const ID_CRITERIA_MAX_ENTRIES = 4096;
+const idCriteria = new Map();
+
+// Recently used threads are kept in memory, bounded to this many entries
+const THREAD_CACHE_MAX_ENTRIES = 1024;
+// Columns held by the thread cache, reads selecting only these are served from memory
+const CACHED_THREAD_COLUMNS = new Set(['id', 'system_context', 'history']);
+const CACHED_THREAD_SELECT = [...CACHED_THREAD_COLUMNS];
+// Columns read when only a thread's history is needed
+const HISTORY_SELECT = Object.freeze(['id', 'history']);
+// Select list -> whether the thread cache covers it; callers pass module-level constants, so each list is checked once
+const cachedSelects = new WeakMap();
+
+/**
+ * @function isCachedSelect
+ * @description Checks whether every column of a select list is held by the thread cache.
+ * @param {string[]} select - The columns to load.
+ * @returns {boolean} True if the read can be served from the thread cache.
+ */
+const isCachedSelect = (select) => {
+  let cached = cachedSelects.get(select);
+  if (cached === undefined) {
+    cached = select.every(column => CACHED_THREAD_COLUMNS.has(column));
+    cachedSelects.set(select, cached);
+  }
+  return cached;
+};
+
+// The V Rising timer is stored under a single fixed ID
+const TIMER_CRITERIA = Object.freeze({ id: 'vrising_timer' });
+
+/**
+ * @function getIdCriteria
+ * @description Returns a shared, frozen `{ id }` criteria object for a thread ID.
+ * @param {string} threadId - The ID of the thread.
+ * @returns {object} The criteria object.
+ */
+const getIdCriteria = (threadId) => {
+  let criteria = idCriteria.get(threadId);
+  if (!criteria) {
+    criteria = Object.freeze({ id: threadId });
+    idCriteria.set(threadId, criteria);
+    if (idCriteria.size > ID_CRITERIA_MAX_ENTRIES) {
+      idCriteria.delete(idCriteria.keys().next().value);
+    }
+  }
+  return criteria;
+};
+
+// Upper bound for the connection pool, the bot never needs more concurrent queries than this
+const MAX_POOL_SIZE = 32;
+
+// Driver error codes and TypeORM error names that mean the connection was lost, not that the query failed
+const CONNECTION_ERROR_CODES = new Set(['ECONNRESET', 'ECONNREFUSED', 'EPIPE', 'ETIMEDOUT', '57P01', '08003', '08006']);
+const CONNECTION_ERROR_NAMES = new Set(['CannotExecuteNotConnectedError', 'ConnectionIsNotSetError', 'ConnectionNotFoundError']);
+
+/**
+ * @function isConnectionError
+ * @description Checks whether an error was caused by a lost database connection.
+ * @param {Error} error - The error to inspect.
+ * @returns {boolean} True if reconnecting may fix the operation.
+ */
+const isConnectionError = (error) =>
+  CONNECTION_ERROR_NAMES.has(error?.name) ||
+  CONNECTION_ERROR_CODES.has(error?.code) ||
+  CONNECTION_ERROR_CODES.has(error?.driverError?.code);
+
 /**
  * @class DatabaseService
  * @description This class manages the database connection and provides methods to interact with the database.
@@ -10,6 +87,23 @@ const VRisingTimer = require('../models/VRisingTimer');
 class DatabaseService {
   constructor() {
     this.connection = null;
+    this.connecting = null;
+    this.reconnecting = null;
+    // Last counted thread total, adjusted locally by creates and deletes until it is refreshed
+    this.threadCountCache = null;
+    this.threadCountDelta = 0;
+    // User ID -> { count, countedAt }, kept in step with creates and deletes
+    this.userThreadCounts = new Map();
+    // Thread ID -> cached thread (or null for a thread without a persona), least recently used first
+    this.threadCache = new Map();
+    // Thread ID -> history entries not yet written to the database
+    this.pendingHistory = new Map();
+    // Thread ID -> history entries currently being written
+    this.flushingHistory = new Map();
+    this.pendingHistoryPairs = 0;
+    this.historyFlushTimer = null;
+    // Flushes run one after another so each thread's entries are written in order
+    this.historyFlush = Promise.resolve(true);
     this.config = {
       type: process.env.DB_TYPE || 'better-sqlite3',
       database: process.env.DB_NAME || 'persona_bot.db',
@@ -18,10 +112,18 @@ class DatabaseService {
       username: process.env.DB_USER,
       password: process.env.DB_PASSWORD,
       synchronize: false,
-      logging: true,
+      // Logging every query is costly on the per-message path, opt in with DB_LOGGING=true
+      logging: process.env.DB_LOGGING === 'true' ? true : ['error', 'warn'],
       entities: [PersonaThread, VRisingTimer],
+      // Schema changes ship as migrations and are applied on connect, since synchronize is off
+      migrations: [path.join(__dirname, '..', 'migrations', '*.js')],
+      migrationsRun: true,
       extra: {
-        connectionLimit: process.env.DB_POOL_SIZE || 5,
+        // Pool size for mysql (connectionLimit) and postgres (max)
+        connectionLimit: Math.min(Number(process.env.DB_POOL_SIZE) || 5, MAX_POOL_SIZE),
+        max: Math.min(Number(process.env.DB_POOL_SIZE) || 5, MAX_POOL_SIZE),
+        // Let an idle bot release every pooled connection
+        min: 0,
         idleTimeoutMillis: 30000
       }
     };
@@ -30,9 +132,25 @@ class DatabaseService {
   /**
    * @async
    * @function connect
-   * @description Establishes a connection to the database.
+   * @description Establishes a connection to the database. The connection is shared, so repeated or concurrent calls reuse it.
    */
   async connect() {
+    if (this.connection?.isConnected) return true;
+    if (!this.connecting) {
+      this.connecting = this.openConnection().finally(() => {
+        this.connecting = null;
+      });
+    }
+    return this.connecting;
+  }
+
+  /**
+   * @async
+   * @function openConnection
+   * @description Opens a new database connection.
+   * @returns {Promise<boolean>} True if connected, false otherwise.
+   */
+  async openConnection() {
     try {
       this.connection = await createConnection(this.config);
       logger.info(`Database connection established (${this.config.type})`);
@@ -51,6 +169,8 @@ class DatabaseService {
   async disconnect() {
     try {
       if (this.connection && this.connection.isConnected) {
+        // Persist any buffered history before closing
+        await this.flushHistory();
         await this.connection.close();
         logger.info('Database connection closed');
       }
@@ -59,6 +179,49 @@ class DatabaseService {
     }
   }
 
+  /**
+   * @async
+   * @function reconnect
+   * @description Replaces a lost connection. Concurrent callers share a single reconnect attempt.
+   * @returns {Promise<boolean>} True if connected, false otherwise.
+   */
+  async reconnect() {
+    if (!this.reconnecting) {
+      this.reconnecting = (async () => {
+        try {
+          if (this.connection?.isConnected) {
+            await this.connection.close();
+          }
+        } catch (error) {
+          logger.warn('Error closing stale database connection:', error);
+        }
+        return this.connect();
+      })().finally(() => {
+        this.reconnecting = null;
+      });
+    }
+    return this.reconnecting;
+  }
+
+  /**
+   * @async
+   * @function withRepository
+   * @description Runs an operation against an entity repository, reconnecting and retrying once if the connection was lost.
+   * @param {EntitySchema} entity - The entity whose repository to use.
+   * @param {Function} operation - Receives the repository and returns a promise.
+   * @returns {Promise<*>} The operation's result.
+   */
+  async withRepository(entity, operation) {
+    try {
+      return await operation(this.connection.getRepository(entity));
+    } catch (error) {
+      if (!isConnectionError(error)) throw error;
+      logger.warn('Database connection lost, reconnecting:', error);
+      if (!await this.reconnect()) throw error;
+      return operation(this.connection.getRepository(entity));
+    }
+  }
+
   /**
    * @async
    * @function isConnected
@@ -74,18 +237,133 @@ class DatabaseService {
    * @function getThreadData
    * @description Retrieves thread data from the database by thread ID.
    * @param {string} threadId - The ID of the thread to retrieve.
+   * @param {string[]} [select] - Optional list of columns to load instead of the whole row.
    * @returns {Promise<PersonaThread|null>} The thread data or null if not found.
    */
-  async getThreadData(threadId) {
+  async getThreadData(threadId, select) {
     try {
-      const repo = this.connection.getRepository(PersonaThread);
-      return await repo.findOne({ where: { id: threadId } });
+      if (select && isCachedSelect(select)) {
+        return await this.getCachedThread(threadId);
+      }
+      const thread = await this.withRepository(PersonaThread, repo => repo.findOne({ where: getIdCriteria(threadId), select }));
+      return this.withUnsavedHistory(threadId, thread);
     } catch (error) {
       logger.error(`Error getting thread data for ID ${threadId}:`, error);
       return null;
     }
   }
 
+  /**
+   * @async
+   * @function getCachedThread
+   * @description Retrieves the cached columns of a thread, loading them from the database on a miss. The returned object is shared and must not be modified.
+   * @param {string} threadId - The ID of the thread to retrieve.
+   * @returns {Promise<PersonaThread|null>} The thread data or null if not found.
+   */
+  async getCachedThread(threadId) {
+    if (this.threadCache.has(threadId)) {
+      const thread = this.threadCache.get(threadId);
+      // Move to the back so the least recently used thread is evicted first
+      this.threadCache.delete(threadId);
+      this.threadCache.set(threadId, thread);
+      return thread;
+    }
+
+    const thread = await this.withRepository(PersonaThread, repo =>
+      repo.findOne({ where: getIdCriteria(threadId), select: CACHED_THREAD_SELECT }));
+    // Misses are cached too, so plain threads don't query the database on every message
+    this.cacheThread(threadId, this.withUnsavedHistory(threadId, thread));
+    return this.threadCache.get(threadId);
+  }
+
+  /**
+   * @async
+   * @function getAllActiveThreadData
+   * @description Retrieves the cached columns of the most recently created threads in a single query, with IDs as strings.
+   * @param {number} [limit=1024] - The maximum number of threads to return.
+   * @returns {Promise<PersonaThread[]>} The threads, newest first.
+   */
+  async getAllActiveThreadData(limit = THREAD_CACHE_MAX_ENTRIES) {
+    try {
+      const rows = await this.withRepository(PersonaThread, repo => repo.createQueryBuilder('thread')
+        // Snowflake IDs don't fit a JS number, so the INTEGER id column is read back as text to keep it exact
+        .select('CAST(thread.id AS TEXT)', 'id')
+        .addSelect('thread.system_context', 'system_context')
+        .addSelect('thread.history', 'history')
+        .orderBy('thread.created_at', 'DESC')
+        .limit(limit)
+        .getRawMany());
+      // Raw rows skip the column transformer
+      return rows.map(row => ({ ...row, history: JSON.parse(row.history) }));
+    } catch (error) {
+      logger.error('Error getting active thread data:', error);
+      return [];
+    }
+  }
+
+  /**
+   * @async
+   * @function preloadThreadCache
+   * @description Fills the thread cache at startup so the first message in each thread skips the database.
+   * @returns {Promise<number>} The number of threads loaded.
+   */
+  async preloadThreadCache() {
+    if (!(await this.isConnected())) return 0;
+    const threads = await this.getAllActiveThreadData();
+    // Insert oldest first so the newest threads are the last to be evicted
+    for (let i = threads.length - 1; i >= 0; i--) {
+      const threadId = threads[i].id;
+      if (!this.threadCache.has(threadId)) {
+        this.cacheThread(threadId, this.withUnsavedHistory(threadId, threads[i]));
+      }
+    }
+    logger.info(`Preloaded ${threads.length} threads into the thread cache`);
+    return threads.length;
+  }
+
+  /**
+   * @function cacheThread
+   * @description Stores a thread in the thread cache, evicting the least recently used entry when full.
+   * @param {string} threadId - The ID of the thread.
+   * @param {PersonaThread|null} thread - The thread data, or null if the thread has no persona.
+   */
+  cacheThread(threadId, thread) {
+    this.threadCache.delete(threadId);
+    this.threadCache.set(threadId, thread);
+    if (this.threadCache.size > THREAD_CACHE_MAX_ENTRIES) {
+      this.threadCache.delete(this.threadCache.keys().next().value);
+    }
+  }
+
+  /**
+   * @function withUnsavedHistory
+   * @description Adds history entries that have not reached the database yet to a loaded thread.
+   * @param {string} threadId - The ID of the thread.
+   * @param {PersonaThread|null} thread - The thread as loaded from the database.
+   * @returns {PersonaThread|null} The same thread with its history brought up to date.
+   */
+  withUnsavedHistory(threadId, thread) {
+    const flushing = this.flushingHistory.get(threadId);
+    const pending = this.pendingHistory.get(threadId);
+    if (thread?.history && (flushing || pending)) {
+      thread.history = trimHistory(thread.history.concat(flushing || [], pending || []));
+    }
+    return thread;
+  }
+
+  /**
+   * @async
+   * @function getThreadHistoryTail
+   * @description Retrieves only the most recent history entries of a thread.
+   * @param {string} threadId - The ID of the thread.
+   * @param {number} [count=24] - The number of entries to return.
+   * @returns {Promise<Array|null>} The latest history entries or null if the thread was not found.
+   */
+  async getThreadHistoryTail(threadId, count = HISTORY_LIMIT) {
+    const thread = await this.getThreadData(threadId, HISTORY_SELECT);
+    return thread ? thread.history.slice(-count) : null;
+  }
+
   /**
    * @async
    * @function getUserThreads
@@ -95,12 +373,11 @@ class DatabaseService {
    */
   async getUserThreads(userId) {
     try {
-      const repo = this.connection.getRepository(PersonaThread);
-      return await repo.find({
+      return await this.withRepository(PersonaThread, repo => repo.find({
         where: { created_by: userId },
         select: ['id', 'name', 'created_at'],
         order: { created_at: 'DESC' }
-      });
+      }));
     } catch (error) {
       logger.error(`Error getting user threads for user ID ${userId}:`, error);
       return [];
@@ -117,8 +394,11 @@ class DatabaseService {
    */
   async createThreadDocument(threadId, data) {
     try {
-      const repo = this.connection.getRepository(PersonaThread);
-      await repo.insert({ id: threadId, ...data });
+      await this.withRepository(PersonaThread, repo => repo.insert({ id: threadId, ...data }));
+      // Drop a cached miss so the next read loads the new thread
+      this.threadCache.delete(threadId);
+      this.threadCountDelta++;
+      this.adjustUserThreadCount(data.created_by, 1);
       return true;
     } catch (error) {
       logger.error(`Error creating thread document for ID ${threadId}:`, error);
@@ -126,48 +406,159 @@ class DatabaseService {
     }
   }
 
- /**
- * @async
- * @function updateThreadHistory
- * @description Updates the history of a thread in the database.
- * @param {string} threadId - The ID of the thread to update.
- * @param {string} userMessage - The user's message.
- * @param {string} aiResponse - The AI's response.
- * @returns {Promise<boolean>} True if successful, false otherwise.
- */
- async updateThreadHistory(threadId, userMessage, aiResponse) {
-  try {
-      const repo = this.connection.getRepository(PersonaThread);
-      const thread = await repo.findOne({ where: { id: threadId } });
-
-      if (!thread) return false;
-
-      const history = thread.history;
-      history.push(
-          { role: 'user', parts: [{ text: userMessage }] },
-          { role: 'model', parts: [{ text: aiResponse }] }
-      );
-
-      // Keep last 12 message pairs (24 entries)
-      thread.history = thread.history.slice(-24);
-      await repo.save(thread);
+  /**
+   * @async
+   * @function updateThreadHistory
+   * @description Queues a message pair for the thread's history. Writes are batched and flushed by size or interval.
+   * @param {string} threadId - The ID of the thread to update.
+   * @param {string} userMessage - The user's message.
+   * @param {string} aiResponse - The AI's response.
+   * @returns {Promise<boolean>} True if successful, false otherwise.
+   */
+  async updateThreadHistory(threadId, userMessage, aiResponse) {
+    return this.appendHistory(threadId, [
+      { role: 'user', parts: [{ text: userMessage }] },
+      { role: 'model', parts: [{ text: aiResponse }] }
+    ]);
+  }
+
+  /**
+   * @async
+   * @function appendHistory
+   * @description Queues already built history entries for a thread. Writes are batched and flushed by size or interval.
+   * @param {string} threadId - The ID of the thread to update.
+   * @param {Array} entries - The user and model history entries to append.
+   * @returns {Promise<boolean>} True if successful, false otherwise.
+   */
+  async appendHistory(threadId, entries) {
+    const pending = this.pendingHistory.get(threadId) || [];
+    pending.push(...entries);
+    trimHistoryInPlace(pending);
+    this.pendingHistory.set(threadId, pending);
+    this.pendingHistoryPairs++;
+    // Keep a cached copy current, the array is replaced so earlier readers keep a stable snapshot
+    const cached = this.threadCache.get(threadId);
+    if (cached?.history) {
+      cached.history = trimHistory(cached.history.concat(entries));
+    }
+
+    if (this.pendingHistoryPairs >= HISTORY_FLUSH_BATCH_SIZE) {
+      return this.flushHistory();
+    }
+    this.scheduleHistoryFlush();
+    return true;
+  }
+
+  /**
+   * @function scheduleHistoryFlush
+   * @description Starts the flush interval timer unless one is already pending.
+   */
+  scheduleHistoryFlush() {
+    if (!this.historyFlushTimer) {
+      this.historyFlushTimer = setTimeout(() => this.flushHistory(), HISTORY_FLUSH_INTERVAL_MS);
+      // Don't keep the process alive just for a pending flush
+      this.historyFlushTimer.unref();
+    }
+  }
+
+  /**
+   * @async
+   * @function flushHistory
+   * @description Writes all buffered history entries to the database once any flush in progress has finished.
+   * @returns {Promise<boolean>} True if every thread was saved, false otherwise.
+   */
+  async flushHistory() {
+    clearTimeout(this.historyFlushTimer);
+    this.historyFlushTimer = null;
+    this.pendingHistoryPairs = 0;
+    this.historyFlush = this.historyFlush.then(() => this.writePendingHistory());
+    return this.historyFlush;
+  }
+
+  /**
+   * @async
+   * @function writePendingHistory
+   * @description Saves the buffered history entries of every thread in one batch.
+   * @returns {Promise<boolean>} True if the batch was saved, false otherwise.
+   */
+  async writePendingHistory() {
+    if (!this.pendingHistory.size) return true;
+
+    this.flushingHistory = this.pendingHistory;
+    this.pendingHistory = new Map();
+
+    try {
+      const saved = await this.updateThreadHistoriesBulk(this.flushingHistory);
+      if (!saved) {
+        this.requeueHistory(this.flushingHistory);
+      }
+      return saved;
+    } finally {
+      this.flushingHistory = new Map();
+    }
+  }
+
+  /**
+   * @function requeueHistory
+   * @description Puts the entries of a failed flush back in the buffer, ahead of anything queued since, and schedules a retry.
+   * @param {Map<string, Array>} batch - Thread ID -> history entries that were not saved.
+   */
+  requeueHistory(batch) {
+    for (const [threadId, entries] of batch) {
+      const newer = this.pendingHistory.get(threadId) || [];
+      const pending = entries.concat(newer);
+      trimHistoryInPlace(pending);
+      this.pendingHistory.set(threadId, pending);
+      this.pendingHistoryPairs += entries.length / 2;
+    }
+    logger.warn(`Requeued unsaved history for ${batch.size} threads, retrying in ${HISTORY_FLUSH_INTERVAL_MS}ms`);
+    this.scheduleHistoryFlush();
+  }
+
+  /**
+   * @async
+   * @function updateThreadHistoriesBulk
+   * @description Appends history entries to many threads inside a single transaction, so the batch costs one commit.
+   * @param {Map<string, Array>} batch - Thread ID -> history entries to append, in order.
+   * @returns {Promise<boolean>} True if successful, false otherwise.
+   */
+  async updateThreadHistoriesBulk(batch) {
+    try {
+      await this.withRepository(PersonaThread, repo => repo.manager.transaction(async manager => {
+        for (const [threadId, entries] of batch) {
+          const criteria = getIdCriteria(threadId);
+          const thread = await manager.findOne(PersonaThread, { where: criteria, select: HISTORY_SELECT });
+          if (!thread) continue;
+
+          // Update only the history column instead of re-saving the whole row
+          await manager.update(PersonaThread, criteria, {
+            history: trimHistory(thread.history.concat(entries))
+          });
+        }
+      }));
       return true;
-  } catch (error) {
-      logger.error(`Error updating thread history for ID ${threadId}:`, error);
+    } catch (error) {
+      logger.error(`Error updating thread history for ${batch.size} threads:`, error);
       return false;
-  }
+    }
   }
 
   /**
    * @async
    * @function getActiveThreadCount
-   * @description Retrieves the count of active threads.
+   * @description Retrieves the count of active threads, served from a short-lived cache between refreshes.
    * @returns {Promise<number>} The number of active threads.
    */
   async getActiveThreadCount() {
     try {
-      const repo = this.connection.getRepository(PersonaThread);
-      return await repo.count();
+      const cached = this.threadCountCache;
+      if (cached && performance.now() - cached.countedAt < THREAD_COUNT_TTL_MS) {
+        return cached.count + this.threadCountDelta;
+      }
+      const count = await this.withRepository(PersonaThread, repo => repo.count());
+      this.threadCountCache = { count, countedAt: performance.now() };
+      this.threadCountDelta = 0;
+      return count;
     } catch (error) {
       logger.error('Error getting active thread count:', error);
       return 0;
@@ -177,20 +568,43 @@ class DatabaseService {
   /**
    * @async
    * @function getUserThreadCount
-   * @description Retrieves the count of threads created by a specific user.
+   * @description Retrieves the count of threads created by a specific user, served from a short-lived cache between refreshes.
    * @param {string} userId - The ID of the user.
    * @returns {Promise<number>} The number of threads created by the user.
    */
   async getUserThreadCount(userId) {
     try {
-      const repo = this.connection.getRepository(PersonaThread);
-      return await repo.count({ where: { created_by: userId } });
+      const key = String(userId);
+      const cached = this.userThreadCounts.get(key);
+      if (cached && performance.now() - cached.countedAt < THREAD_COUNT_TTL_MS) {
+        return cached.count;
+      }
+      const count = await this.withRepository(PersonaThread, repo => repo.count({ where: { created_by: userId } }));
+      this.userThreadCounts.delete(key);
+      this.userThreadCounts.set(key, { count, countedAt: performance.now() });
+      if (this.userThreadCounts.size > USER_THREAD_COUNT_MAX_ENTRIES) {
+        this.userThreadCounts.delete(this.userThreadCounts.keys().next().value);
+      }
+      return count;
     } catch (error) {
       logger.error(`Error getting thread count for user ID ${userId}:`, error);
       return 0;
     }
   }
 
+  /**
+   * @function adjustUserThreadCount
+   * @description Applies a change to a user's cached thread count, if one is cached.
+   * @param {string} userId - The ID of the user.
+   * @param {number} change - The amount to add to the count.
+   */
+  adjustUserThreadCount(userId, change) {
+    const cached = this.userThreadCounts.get(String(userId));
+    if (cached) {
+      cached.count = Math.max(0, cached.count + change);
+    }
+  }
+
   /**
    * @async
    * @function deleteThread
@@ -200,8 +614,16 @@ class DatabaseService {
    */
   async deleteThread(threadId) {
     try {
-      const repo = this.connection.getRepository(PersonaThread);
-      await repo.delete({ id: threadId });
+      const result = await this.withRepository(PersonaThread, repo => repo.delete(getIdCriteria(threadId)));
+      if (result?.affected !== 0) {
+        this.threadCountDelta--;
+        // The creator read back from the INTEGER column is a rounded snowflake that can't be matched to a user ID,
+        // so every cached count is dropped rather than the wrong one adjusted
+        this.userThreadCounts.clear();
+      }
+      // Buffered history for a deleted thread has nowhere to go
+      this.pendingHistory.delete(threadId);
+      this.threadCache.delete(threadId);
       logger.info(`Deleted thread data for ID: ${threadId}`);
       return true;
     } catch (error) {
@@ -219,8 +641,7 @@ class DatabaseService {
    */
   async saveTimerData(timerData) {
     try {
-      const repo = this.connection.getRepository(VRisingTimer);
-      await repo.upsert(timerData, ['id']);
+      await this.withRepository(VRisingTimer, repo => repo.upsert(timerData, ['id']));
       return true;
     } catch (error) {
       logger.error('Error saving timer data:', error);
@@ -236,13 +657,51 @@ class DatabaseService {
    */
   async getTimerData() {
     try {
-      const repo = this.connection.getRepository(VRisingTimer);
-      return await repo.findOne({ where: { id: 'vrising_timer' } });
+      return await this.withRepository(VRisingTimer, repo => repo.findOne({ where: TIMER_CRITERIA }));
     } catch (error) {
       logger.error('Error getting timer data:', error);
       return null;
     }
   }
+
+  /**
+   * @async
+   * @function getAllTimerData
+   * @description Retrieves every stored VRising timer in a single query, with channel IDs as strings.
+   * @returns {Promise<VRisingTimer[]>} The timers, empty if none are found.
+   */
+  async getAllTimerData() {
+    try {
+      return await this.withRepository(VRisingTimer, repo => repo.createQueryBuilder('timer')
+        .select('timer.id', 'id')
+        .addSelect('timer.end_time', 'end_time')
+        // channel_id is an INTEGER column and a snowflake doesn't fit a JS number, so it is read as text
+        .addSelect('CAST(timer.channel_id AS TEXT)', 'channel_id')
+        .addSelect('timer.castle_level', 'castle_level')
+        .getRawMany());
+    } catch (error) {
+      logger.error('Error getting all timer data:', error);
+      return [];
+    }
+  }
+
+  /**
+   * @async
+   * @function deleteTimerData
+   * @description Deletes VRising timer data.
+   * @param {string} [timerId='vrising_timer'] - The ID of the timer to delete.
+   * @returns {Promise<boolean>} True if a timer was deleted, false otherwise.
+   */
+  async deleteTimerData(timerId = TIMER_CRITERIA.id) {
+    try {
+      const criteria = timerId === TIMER_CRITERIA.id ? TIMER_CRITERIA : { id: timerId };
+      const result = await this.withRepository(VRisingTimer, repo => repo.delete(criteria));
+      return result?.affected !== 0;
+    } catch (error) {
+      logger.error('Error deleting timer data:', error);
+      return false;
+    }
+  }
 }
 
 module.exports = new DatabaseService();
\ No newline at end of file
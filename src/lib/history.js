@@ -0,0 +1,28 @@
+// Keep last 12 message pairs (24 entries)
+const HISTORY_LIMIT = 24;
+// The opening exchange sets up the roleplay, so it stays in the window as an anchor
+const HISTORY_ANCHOR_ENTRIES = 2;
+
+/**
+ * @function trimHistory
+ * @description Caps a conversation history to the opening exchange plus the most recent entries.
+ * @param {Array} history - The array of conversation history entries.
+ * @returns {Array} The same array if it is within the limit, otherwise a trimmed copy.
+ */
+const trimHistory = (history) => {
+  if (history.length <= HISTORY_LIMIT) return history;
+  return history.slice(0, HISTORY_ANCHOR_ENTRIES).concat(history.slice(HISTORY_ANCHOR_ENTRIES - HISTORY_LIMIT));
+};
+
+/**
+ * @function trimHistoryInPlace
+ * @description Caps a conversation history like trimHistory, removing the oldest entries after the anchor in place.
+ * @param {Array} history - The array of conversation history entries.
+ */
+const trimHistoryInPlace = (history) => {
+  if (history.length > HISTORY_LIMIT) {
+    history.splice(HISTORY_ANCHOR_ENTRIES, history.length - HISTORY_LIMIT);
+  }
+};
+
+module.exports = { HISTORY_LIMIT, trimHistory, trimHistoryInPlace };
@@ -1,6 +1,59 @@
-const { createLogger, format, transports } = require('winston');
+const fs = require('fs');
+const { createLogger, format, transports, Transport } = require('winston');
 const { combine, timestamp, printf, colorize } = format;
 
+// Winston stores the fully formatted line under this symbol
+const MESSAGE = Symbol.for('message');
+
+/**
+ * @class BufferedFileTransport
+ * @description Appends log lines to a file in batches: when the buffer is full, on an interval, or immediately for errors.
+ */
+class BufferedFileTransport extends Transport {
+  constructor({ filename, capacity = 512, flushInterval = 30000, ...options }) {
+    super(options);
+    this.capacity = capacity;
+    this.buffer = [];
+    // Batches are written synchronously, so nothing is left in flight when the process exits
+    this.fd = fs.openSync(filename, 'a');
+    this.flushTimer = setInterval(() => this.flush(), flushInterval);
+    // Don't keep the process alive just for the flush interval
+    this.flushTimer.unref();
+    // Write whatever is still buffered when the process exits
+    process.on('exit', () => this.flush());
+  }
+
+  log(info, callback) {
+    this.buffer.push(`${info[MESSAGE]}\n`);
+    if (this.buffer.length >= this.capacity || info.level === 'error') {
+      this.flush();
+    }
+    callback();
+  }
+
+  /**
+   * @function flush
+   * @description Appends all buffered lines to the file in a single write.
+   */
+  flush() {
+    if (!this.buffer.length || this.fd === null) return;
+    const data = this.buffer.join('');
+    this.buffer = [];
+    try {
+      fs.writeSync(this.fd, data);
+    } catch (error) {
+      this.emit('error', error);
+    }
+  }
+
+  close() {
+    clearInterval(this.flushTimer);
+    this.flush();
+    fs.closeSync(this.fd);
+    this.fd = null;
+  }
+}
+
 // Custom log format
 const logFormat = printf(({ level, message, timestamp, stack }) => {
   return `${timestamp} [${level}]: ${stack || message}`;
@@ -27,6 +80,16 @@ const logger = createLogger({
   ]
 });
 
+// Optional file logging for long-running hosts (leave LOG_FILE unset on Vercel)
+// Lines are batched into one write every 30s or 512 lines, errors are written right away
+if (process.env.LOG_FILE) {
+  logger.add(new BufferedFileTransport({
+    filename: process.env.LOG_FILE,
+    capacity: 512,
+    flushInterval: 30000
+  }));
+}
+
 // Handle uncaught exceptions - Console is usually sufficient
 // logger.exceptions.handle(
 //   new transports.File({ filename: 'exceptions.log' })
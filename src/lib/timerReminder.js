@@ -0,0 +1,182 @@
+const logger = require('./logger');
+const db = require('./database');
+
+const HOUR_MS = 60 * 60 * 1000;
+// Wake shortly after a reminder point so timer jitter can't run the check just before it
+const REMINDER_SLACK_MS = 1000;
+// Longest delay setTimeout accepts, later reminder points are reached by waking again
+const MAX_TIMEOUT_MS = 2 ** 31 - 1;
+
+// Hours left -> reminder text, sent once when a check passes that point; hours not listed send nothing
+const REMINDERS = new Map([
+  [0, 'has run out'],
+  [1, 'runs out in 1 hour'],
+  [3, 'runs out in 3 hours']
+]);
+
+let reminderClient = null;
+let reminderTimeout = null;
+// Timer ID -> { endTime, checkedAt }, reminder points up to checkedAt have been handled for that timer
+let checkedTimers = new Map();
+
+/**
+ * @function getCheckedSince
+ * @description Returns when a timer was last checked. A timer not seen before counts as checked now: after a restart its
+ * earlier reminders may already have been posted.
+ * @param {VRisingTimer} timer - The timer.
+ * @param {number} endTime - When the timer runs out, in epoch milliseconds.
+ * @param {number} now - The time of this check.
+ * @returns {number} The time reminder points are counted from.
+ */
+const getCheckedSince = (timer, endTime, now) => {
+  const checked = checkedTimers.get(timer.id);
+  return checked && checked.endTime === endTime ? checked.checkedAt : now;
+};
+
+/**
+ * @function getDueReminder
+ * @description Looks up the reminder a timer passed since it was last checked. Timers that have run out are always due.
+ * @param {number} endTime - When the timer runs out, in epoch milliseconds.
+ * @param {number} since - The time the timer was last checked.
+ * @param {number} now - The time of this check.
+ * @returns {number|undefined} The hours left of the due reminder, if any.
+ */
+const getDueReminder = (endTime, since, now) => {
+  if (endTime <= now) return 0;
+  let due;
+  for (const hours of REMINDERS.keys()) {
+    const remindAt = endTime - hours * HOUR_MS;
+    if (remindAt > since && remindAt <= now && (due === undefined || hours < due)) {
+      due = hours;
+    }
+  }
+  return due;
+};
+
+/**
+ * @async
+ * @function sendReminder
+ * @description Posts a blood essence reminder in the timer's channel, removing the timer once it has run out.
+ * @param {Client} client - The Discord client.
+ * @param {VRisingTimer} timer - The timer to remind about.
+ * @param {number} hoursLeft - The hours left of the reminder being sent.
+ * @param {string} text - The reminder text from the decision table.
+ */
+async function sendReminder(client, timer, hoursLeft, text) {
+  const channel = await client.channels.fetch(timer.channel_id);
+  await channel.send(`⏰ Level ${timer.castle_level} castle blood essence ${text}!`);
+  if (hoursLeft === 0) {
+    await db.deleteTimerData(timer.id);
+  }
+}
+
+/**
+ * @async
+ * @function sendReminders
+ * @description Sends the reminders that are due for the given timers concurrently.
+ * @param {Client} client - The Discord client.
+ * @param {VRisingTimer[]} timers - The stored timers.
+ * @param {number} now - The current time in milliseconds since the epoch.
+ * @returns {Promise<number>} The number of reminders sent.
+ */
+async function sendReminders(client, timers, now) {
+  // Rebuilt on every check, so timers that were removed are forgotten
+  const checked = new Map();
+  const sends = [];
+  for (const timer of timers) {
+    const endTime = Date.parse(timer.end_time);
+    const hoursLeft = getDueReminder(endTime, getCheckedSince(timer, endTime, now), now);
+    checked.set(timer.id, { endTime, checkedAt: now });
+    const text = REMINDERS.get(hoursLeft);
+    if (text) {
+      sends.push(sendReminder(client, timer, hoursLeft, text));
+    }
+  }
+  checkedTimers = checked;
+
+  // One unreachable channel must not hold back the other reminders
+  const results = await Promise.allSettled(sends);
+  for (const result of results) {
+    if (result.status === 'rejected') {
+      logger.error('Failed to send blood timer reminder:', result.reason);
+    }
+  }
+  return results.length;
+}
+
+/**
+ * @function scheduleNextCheck
+ * @description Sleeps until the soonest upcoming reminder point of any timer. Nothing is scheduled when no timers are left.
+ * @param {VRisingTimer[]} timers - The stored timers.
+ * @param {number} now - The current time in milliseconds since the epoch.
+ */
+function scheduleNextCheck(timers, now) {
+  clearTimeout(reminderTimeout);
+  reminderTimeout = null;
+
+  let nextWake = Infinity;
+  for (const timer of timers) {
+    const endTime = Date.parse(timer.end_time);
+    for (const hours of REMINDERS.keys()) {
+      const wakeAt = endTime - hours * HOUR_MS + REMINDER_SLACK_MS;
+      if (wakeAt > now && wakeAt < nextWake) nextWake = wakeAt;
+    }
+  }
+  if (nextWake === Infinity) return;
+
+  reminderTimeout = setTimeout(checkTimers, Math.min(nextWake - now, MAX_TIMEOUT_MS));
+  // Don't keep the process alive just for reminders
+  reminderTimeout.unref();
+}
+
+/**
+ * @async
+ * @function checkTimers
+ * @description Loads all timers in one query, sends the reminders that are due and schedules the next check.
+ */
+async function checkTimers() {
+  try {
+    const timers = await db.getAllTimerData();
+    const now = Date.now();
+    await sendReminders(reminderClient, timers, now);
+    scheduleNextCheck(timers, now);
+  } catch (error) {
+    logger.error('Blood timer reminder check failed:', error);
+  }
+}
+
+/**
+ * @async
+ * @function rescheduleTimerReminders
+ * @description Recomputes the next wake-up after a timer was started, without sending reminders.
+ */
+async function rescheduleTimerReminders() {
+  if (!reminderClient) return;
+  try {
+    const timers = await db.getAllTimerData();
+    const now = Date.now();
+    // A timer that was just started only gets reminders for points from now on, not ones that predate it
+    for (const timer of timers) {
+      const endTime = Date.parse(timer.end_time);
+      if (checkedTimers.get(timer.id)?.endTime !== endTime) {
+        checkedTimers.set(timer.id, { endTime, checkedAt: now });
+      }
+    }
+    scheduleNextCheck(timers, now);
+  } catch (error) {
+    logger.error('Failed to reschedule blood timer reminders:', error);
+  }
+}
+
+/**
+ * @function startTimerReminders
+ * @description Sends any reminders that are due and sleeps until the next one.
+ * @param {Client} client - The Discord client.
+ */
+function startTimerReminders(client) {
+  if (reminderClient) return;
+  reminderClient = client;
+  checkTimers();
+}
+
+module.exports = { rescheduleTimerReminders, startTimerReminders };
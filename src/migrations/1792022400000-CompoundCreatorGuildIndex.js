@@ -0,0 +1,30 @@
+/**
+ * @class CompoundCreatorGuildIndex1792022400000
+ * @description Replaces the separate created_by and guild_id indices on persona_threads with one (created_by, guild_id) index.
+ */
+module.exports = class CompoundCreatorGuildIndex1792022400000 {
+  name = 'CompoundCreatorGuildIndex1792022400000';
+
+  /**
+   * @async
+   * @function up
+   * @param {QueryRunner} queryRunner - The TypeORM query runner.
+   */
+  async up(queryRunner) {
+    await queryRunner.query('CREATE INDEX IF NOT EXISTS "idx_threads_created_by_guild_id" ON "persona_threads" ("created_by", "guild_id")');
+    // The compound index also serves lookups by created_by alone
+    await queryRunner.query('DROP INDEX IF EXISTS "idx_threads_created_by"');
+    await queryRunner.query('DROP INDEX IF EXISTS "idx_threads_guild_id"');
+  }
+
+  /**
+   * @async
+   * @function down
+   * @param {QueryRunner} queryRunner - The TypeORM query runner.
+   */
+  async down(queryRunner) {
+    await queryRunner.query('CREATE INDEX IF NOT EXISTS "idx_threads_guild_id" ON "persona_threads" ("guild_id")');
+    await queryRunner.query('CREATE INDEX IF NOT EXISTS "idx_threads_created_by" ON "persona_threads" ("created_by")');
+    await queryRunner.query('DROP INDEX IF EXISTS "idx_threads_created_by_guild_id"');
+  }
+};
@@ -63,9 +63,9 @@ module.exports = new EntitySchema({
     }
   },
   indices: [
-    { columns: ['created_by'] },
-    { columns: ['guild_id'] },
-    { columns: ['channel_id'] },
-    { columns: ['created_at'] }
+    // Names match the database; the compound index is created by the CompoundCreatorGuildIndex migration
+    { name: 'idx_threads_created_by_guild_id', columns: ['created_by', 'guild_id'] }, // Also serves lookups by created_by alone
+    { name: 'idx_threads_channel_id', columns: ['channel_id'] },
+    { name: 'idx_threads_created_at', columns: ['created_at'] }
   ]
 });
\ No newline at end of file
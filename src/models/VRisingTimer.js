@@ -0,0 +1,24 @@
+const { EntitySchema } = require('typeorm');
+
+module.exports = new EntitySchema({
+  name: 'VRisingTimer',
+  tableName: 'vrising_timers',
+  columns: {
+    id: {
+      primary: true,
+      type: 'text'
+    },
+    end_time: {
+      type: 'text', // ISO 8601 timestamp
+      nullable: false
+    },
+    channel_id: {
+      type: 'integer', // Snowflake; read it back as text (CAST) to keep it exact
+      nullable: false
+    },
+    castle_level: {
+      type: 'integer',
+      nullable: false
+    }
+  }
+});